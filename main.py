@@ -1 +1,39 @@
-#
\ No newline at end of file
+# main.py
+# Run every ETL stage in one process, so the fetch planner
+# (src/fetch_planner.py) dedups requests and picks canonical sources
+# across stages instead of per script.
+
+import os
+
+from src import market_data, forex_indexes, commodities, crypto_market, macro_indicators, chart_export
+from src.fetch_planner import reset
+
+# Order matters: canonical sources run before their fallbacks
+STAGES = [
+    market_data,
+    forex_indexes,
+    commodities,
+    crypto_market,
+    macro_indicators,
+    chart_export,
+]
+
+
+# Intraday bars are opt-in: ETL_INTRADAY=1 python main.py
+if os.getenv("ETL_INTRADAY") == "1":
+    from src import intraday
+    STAGES.insert(STAGES.index(chart_export), intraday)
+
+
+def main():
+    reset()
+    for stage in STAGES:
+        try:
+            stage.main()
+        except Exception as e:
+            print(f"❌ Stage {stage.__name__} failed: {e}")
+    print("🏁 ETL run complete.")
+
+
+if __name__ == "__main__":
+    main()
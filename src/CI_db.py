@@ -1,4 +1,5 @@
 import os
+import tempfile
 import mysql.connector
 
 def get_connection():
@@ -23,7 +24,9 @@ def get_connection():
             password=MYSQL_PASSWORD,
             database=MYSQL_DATABASE,
             ssl_ca=ca_path,
-            ssl_verify_cert=True
+            ssl_verify_cert=True,
+            # bulk_loader staging files only, never arbitrary client paths
+            allow_local_infile_in_path=tempfile.gettempdir()
         )
         print("✅ Connected to database (CI).")
         return conn
@@ -0,0 +1,131 @@
+# src/bulk_loader.py
+# Shared upsert path for all loaders:
+#   - small daily refreshes -> multi-row INSERT ... ON DUPLICATE KEY UPDATE
+#   - large backfills       -> LOAD DATA LOCAL INFILE into a session temp table,
+#                              then a single set-based merge into the target
+
+import os
+import tempfile
+from itertools import chain, islice
+import mysql.connector
+
+# Row count above which the staging-table path is used
+BULK_LOAD_THRESHOLD = int(os.getenv("BULK_LOAD_THRESHOLD", 5000))
+# Rows per executemany() call (rewritten into one multi-row INSERT)
+INSERT_BATCH_SIZE = 1000
+
+
+def upsert_rows(conn, table, columns, rows, update_columns):
+    """Upsert an iterable of (col1, col2, ...) into table and return the row count.
+
+    Only the first BULK_LOAD_THRESHOLD rows are buffered to pick the path;
+    large loads are streamed straight to a TSV file, never held in memory.
+    """
+    rows = iter(rows)
+    head = list(islice(rows, BULK_LOAD_THRESHOLD))
+    if not head:
+        return 0
+
+    if len(head) < BULK_LOAD_THRESHOLD:
+        cursor = conn.cursor()
+        try:
+            _batched_insert(cursor, table, columns, head, update_columns)
+            conn.commit()
+        finally:
+            cursor.close()
+        return len(head)
+
+    path, count = _write_tsv(chain(head, rows))
+    del head
+    try:
+        _staged_merge(conn, table, columns, path, count, update_columns)
+    finally:
+        os.remove(path)
+    return count
+
+
+# ---------------- Small loads ----------------
+def _batched_insert(cursor, table, columns, rows, update_columns=None):
+    placeholders = ", ".join(["%s"] * len(columns))
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    if update_columns:
+        query += " ON DUPLICATE KEY UPDATE " + ", ".join(
+            f"{c} = VALUES({c})" for c in update_columns
+        )
+    rows = iter(rows)
+    while batch := list(islice(rows, INSERT_BATCH_SIZE)):
+        cursor.executemany(query, batch)
+
+
+# ---------------- Large loads ----------------
+def _write_tsv(rows):
+    """Stream rows to a temp TSV file and return (path, row count)"""
+    # Tab-separated, \N for NULL (LOAD DATA defaults)
+    count = 0
+    f = tempfile.NamedTemporaryFile("w", suffix=".tsv", delete=False, newline="", encoding="utf-8")
+    try:
+        with f:
+            for row in rows:
+                f.write("\t".join("\\N" if v is None else str(v) for v in row))
+                f.write("\n")
+                count += 1
+    except BaseException:
+        os.remove(f.name)
+        raise
+    return f.name, count
+
+
+def _read_tsv(path):
+    """Stream rows back from a TSV written by _write_tsv (values as strings)"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for line in f:
+            yield tuple(None if v == "\\N" else v for v in line.rstrip("\n").split("\t"))
+
+
+def _load_infile(cursor, staging, columns, path):
+    cursor.execute(
+        f"LOAD DATA LOCAL INFILE %s INTO TABLE {staging} "
+        f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+        f"({', '.join(columns)})",
+        (path,)
+    )
+
+
+def _drop_staging(cursor, staging):
+    try:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+    except mysql.connector.Error:
+        pass
+
+
+def _staged_merge(conn, table, columns, path, count, update_columns):
+    staging = f"staging_{table}"
+    cols = ", ".join(columns)
+    cursor = conn.cursor()
+    try:
+        try:
+            # Key-less copy of the target columns: no duplicate checks while streaming in
+            cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+            cursor.execute(f"CREATE TEMPORARY TABLE {staging} SELECT {cols} FROM {table} LIMIT 0")
+            _load_infile(cursor, staging, columns, path)
+        except mysql.connector.Error as err:
+            # Temp tables or local_infile disabled (common on managed MySQL):
+            # upsert straight into the target, writing each row only once
+            print(f"⚠️ Staging path unavailable ({err}), falling back to batched upsert")
+            _drop_staging(cursor, staging)
+            _batched_insert(cursor, table, columns, _read_tsv(path), update_columns)
+            conn.commit()
+            print(f"✅ Upserted {count} rows into '{table}' with batched INSERT")
+            return
+
+        updates = ", ".join(f"{c} = VALUES({c})" for c in update_columns)
+        cursor.execute(f"""
+            INSERT INTO {table} ({cols})
+            SELECT {cols} FROM {staging}
+            ON DUPLICATE KEY UPDATE {updates}
+        """)
+        conn.commit()
+        print(f"📦 Bulk-merged {count} rows into '{table}' via staging table")
+    finally:
+        _drop_staging(cursor, staging)
+        cursor.close()
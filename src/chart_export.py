@@ -0,0 +1,191 @@
+# src/chart_export.py
+# Export chart-ready, downsampled series for the visualization layer
+# Output: data/charts/<symbol_id>/<zoom>.json.gz + data/charts/manifest.json
+# Only symbols whose stored rows changed since the last export are rebuilt.
+
+import gzip
+import json
+from datetime import date, timedelta
+from pathlib import Path
+from src.db_loader import get_connection
+
+CHARTS_DIR = Path(__file__).resolve().parents[1] / "data" / "charts"
+MANIFEST_PATH = CHARTS_DIR / "manifest.json"
+
+# table -> value column plotted on the chart
+SOURCES = {
+    "market_data": "close",
+    "macro_indicators": "value",
+}
+
+# zoom -> (window in days back from the last stored date, max points)
+ZOOM_LEVELS = {
+    "3m": (92, 120),
+    "1y": (366, 250),
+    "5y": (1830, 400),
+    "max": (None, 500),
+}
+
+
+# ---------------- Downsampling ----------------
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of [(x, y), ...] sorted by x"""
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average point of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(p[0] for p in points[next_start:next_end]) / span
+        avg_y = sum(p[1] for p in points[next_start:next_end]) / span
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = points[a]
+
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            bx, by = points[j]
+            area = abs((ax - avg_x) * (by - ay) - (ax - bx) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def build_zoom_series(rows):
+    """rows: [(date, value), ...] ascending -> {zoom: {"t": [...], "v": [...]}}"""
+    out = {}
+    if not rows:
+        return out
+
+    last = rows[-1][0]
+    points = [(d.toordinal(), v) for d, v in rows]
+
+    for zoom, (window, max_points) in ZOOM_LEVELS.items():
+        if window is None:
+            selected = points
+        else:
+            cutoff = (last - timedelta(days=window)).toordinal()
+            selected = [p for p in points if p[0] >= cutoff]
+
+        sampled = lttb(selected, max_points)
+        out[zoom] = {
+            "t": [date.fromordinal(x).isoformat() for x, _ in sampled],
+            "v": [round(y, 6) for _, y in sampled],
+        }
+    return out
+
+
+# ---------------- Manifest ----------------
+def load_manifest():
+    if not MANIFEST_PATH.exists():
+        return {}
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️ Could not read chart manifest, rebuilding all: {e}")
+        return {}
+
+
+def save_manifest(manifest):
+    CHARTS_DIR.mkdir(parents=True, exist_ok=True)
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+
+
+# ---------------- DB ----------------
+def load_fingerprints(cursor):
+    """Return {symbol_id: {"table", "rows", "last_date", "checksum"}} from cheap aggregates"""
+    fingerprints = {}
+    for table, column in SOURCES.items():
+        cursor.execute(f"""
+            SELECT symbol_id, COUNT(*), MAX(date), ROUND(SUM({column}), 6)
+            FROM {table}
+            WHERE {column} IS NOT NULL
+            GROUP BY symbol_id
+        """)
+        for symbol_id, count, last_date, checksum in cursor.fetchall():
+            fingerprints[str(symbol_id)] = {
+                "table": table,
+                "rows": int(count),
+                "last_date": str(last_date),
+                "checksum": float(checksum or 0),
+            }
+    return fingerprints
+
+
+def load_series(cursor, table, symbol_id):
+    column = SOURCES[table]
+    cursor.execute(f"""
+        SELECT date, {column}
+        FROM {table}
+        WHERE symbol_id = %s AND {column} IS NOT NULL
+        ORDER BY date
+    """, (symbol_id,))
+    return [(d, float(v)) for d, v in cursor.fetchall()]
+
+
+# ---------------- Export ----------------
+def write_symbol(symbol_id, zoom_series):
+    symbol_dir = CHARTS_DIR / str(symbol_id)
+    symbol_dir.mkdir(parents=True, exist_ok=True)
+    for zoom, series in zoom_series.items():
+        payload = {"symbol_id": int(symbol_id), "zoom": zoom, **series}
+        raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        with gzip.open(symbol_dir / f"{zoom}.json.gz", "wb", compresslevel=9) as f:
+            f.write(raw)
+
+
+def export_charts(force=False):
+    conn = get_connection()
+    if not conn:
+        print("❌ DB connection failed.")
+        return 0
+
+    cursor = conn.cursor()
+    manifest = load_manifest()
+    exported = 0
+    try:
+        fingerprints = load_fingerprints(cursor)
+        for symbol_id, fp in fingerprints.items():
+            if not force and manifest.get(symbol_id) == fp:
+                continue
+
+            rows = load_series(cursor, fp["table"], symbol_id)
+            write_symbol(symbol_id, build_zoom_series(rows))
+            manifest[symbol_id] = fp
+            exported += 1
+    except Exception as err:
+        print(f"❌ Error exporting chart series: {err}")
+    finally:
+        cursor.close()
+        conn.close()
+
+    save_manifest(manifest)
+    return exported
+
+
+# ---------------- MAIN ----------------
+def main():
+    print("📊 Exporting chart series...")
+    exported = export_charts()
+    print(f"✅ Chart export complete ({exported} symbols regenerated).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,56 @@
 # src/commodities_alpha.py
-# BRENT (commodity) + GOLD (via XAUUSD FX)
+# BRENT (commodity) + GOLD (via XAUUSD FX, fallback for GC=F)
 
 import json
 import requests
+from itertools import islice
 from pathlib import Path
 from config.settings import API_KEYS
 from src.symbol_mapper import get_symbol_id
 from src.db_loader import get_connection
+from src.bulk_loader import upsert_rows
+from src.stream_parse import iter_array_items
+from src.forex_indexes import fetch_fx_daily
+from src.fetch_planner import record, should_fetch
+from src.trading_calendar import has_new_session, load_last_dates
+from src.snapshot import merge_snapshot
 
 DATA_PATH = Path(__file__).resolve().parents[1] / "data" / "commodities_indexes.json"
 
-def fetch_brent():
-    url = "https://www.alphavantage.co/query"
-    params = {
-        "function": "BRENT",
-        "apikey": API_KEYS["ALPHA_VANTAGE_API_KEY"]
-    }
-
-    r = requests.get(url, params=params, timeout=30)
-    r.raise_for_status()
-    data = r.json()
-
+def fetch_brent(limit=90):
     sid = get_symbol_id("BRENT")
     if not sid:
         return []
 
-    return [
-        {
-            "symbol_id": sid,
-            "date": row["date"],
-            "open": float(row["value"]),
-            "high": None,
-            "low": None,
-            "close": float(row["value"]),
-            "volume": None
-        }
-        for row in data.get("data", [])[:90]
-    ]
-
-
-def fetch_gold_fx():
     url = "https://www.alphavantage.co/query"
     params = {
-        "function": "FX_DAILY",
-        "from_symbol": "XAU",
-        "to_symbol": "USD",
-        "outputsize": "compact",
+        "function": "BRENT",
         "apikey": API_KEYS["ALPHA_VANTAGE_API_KEY"]
     }
 
-    r = requests.get(url, params=params, timeout=30)
-    r.raise_for_status()
-    data = r.json()
-
-    ts = data.get("Time Series FX (Daily)", {})
+    with requests.get(url, params=params, timeout=30, stream=True) as r:
+        r.raise_for_status()
+        return [
+            {
+                "symbol_id": sid,
+                "date": row["date"],
+                "open": float(row["value"]),
+                "high": None,
+                "low": None,
+                "close": float(row["value"]),
+                "volume": None
+            }
+            for row in islice(iter_array_items(r, "data"), limit)
+        ]
+
+
+def fetch_gold_fx(limit=90, start_date=None):
     sid = get_symbol_id("GOLD")
     if not sid:
         return []
 
     out = []
-    for date, v in list(ts.items())[:90]:
+    for date, v in fetch_fx_daily("XAU", "USD", limit, start_date):
         out.append({
             "symbol_id": sid,
             "date": date,
@@ -76,34 +67,47 @@ def main():
     print("📡 Fetching commodities...")
 
     data = []
-    data.extend(fetch_brent())
-    data.extend(fetch_gold_fx())
-
+    last_dates = load_last_dates("market_data")
+
+    if has_new_session("BRENT", last_dates.get(get_symbol_id("BRENT"))):
+        data.extend(fetch_brent())
+    else:
+        print("⏭️ No new BRENT release, skipping")
+
+    # GOLD is canonical from GC=F (market_data); XAU/USD only fills in when
+    # GC=F did not deliver this run (failed, or not run at all)
+    if not has_new_session("XAU/USD", last_dates.get(get_symbol_id("GOLD"))):
+        print("⏭️ No new session for XAU/USD, skipping")
+    elif should_fetch("GOLD", "alphavantage:XAU/USD"):
+        gold = fetch_gold_fx(start_date=last_dates.get(get_symbol_id("GOLD")))
+        record("GOLD", "alphavantage:XAU/USD", gold)
+        data.extend(gold)
+    else:
+        print("⏭️ GOLD already loaded from its canonical source, skipping XAU/USD")
+
+    if not data:
+        print("✅ No new sessions, nothing to load.")
+        return
+
+    snapshot = merge_snapshot(DATA_PATH, data)
     DATA_PATH.parent.mkdir(parents=True, exist_ok=True)
     with open(DATA_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+        json.dump(snapshot, f, indent=4)
 
-    print(f"✅ JSON saved ({len(data)} rows)")
+    print(f"✅ JSON saved ({len(snapshot)} rows)")
 
     conn = get_connection()
-    cur = conn.cursor()
-    q = """
-    INSERT INTO market_data (symbol_id, date, open, high, low, close, volume)
-    VALUES (%s,%s,%s,%s,%s,%s,%s)
-    ON DUPLICATE KEY UPDATE
-      open=VALUES(open),
-      high=VALUES(high),
-      low=VALUES(low),
-      close=VALUES(close)
-    """
-    for r in data:
-        cur.execute(q, (
-            r["symbol_id"], r["date"],
-            r["open"], r["high"], r["low"],
-            r["close"], r["volume"]
-        ))
-    conn.commit()
-    cur.close()
+    upsert_rows(
+        conn, "market_data",
+        ["symbol_id", "date", "open", "high", "low", "close", "volume"],
+        [
+            (r["symbol_id"], r["date"],
+             r["open"], r["high"], r["low"],
+             r["close"], r["volume"])
+            for r in data
+        ],
+        update_columns=["open", "high", "low", "close"]
+    )
     conn.close()
 
     print("🏁 Done")
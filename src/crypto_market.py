@@ -7,6 +7,9 @@ import requests
 from pathlib import Path
 from src.symbol_mapper import get_symbol_id
 from src.db_loader import get_connection
+from src.bulk_loader import upsert_rows
+from src.trading_calendar import has_new_session, load_last_dates
+from src.snapshot import merge_snapshot
 
 DATA_PATH = Path(__file__).resolve().parents[1] / "data" / "crypto_indexes.json"
 
@@ -64,22 +67,16 @@ def save_json(data):
 
 def insert_db(data):
     conn = get_connection()
-    cur = conn.cursor()
-    q = """
-    INSERT INTO market_data (symbol_id, date, open, high, low, close, volume)
-    VALUES (%s,%s,%s,%s,%s,%s,%s)
-    ON DUPLICATE KEY UPDATE
-      open=VALUES(open),
-      close=VALUES(close),
-      volume=VALUES(volume)
-    """
-    for r in data:
-        cur.execute(q, (
-            r["symbol_id"], r["date"], r["open"],
-            r["high"], r["low"], r["close"], r["volume"]
-        ))
-    conn.commit()
-    cur.close()
+    upsert_rows(
+        conn, "market_data",
+        ["symbol_id", "date", "open", "high", "low", "close", "volume"],
+        [
+            (r["symbol_id"], r["date"], r["open"],
+             r["high"], r["low"], r["close"], r["volume"])
+            for r in data
+        ],
+        update_columns=["open", "close", "volume"]
+    )
     conn.close()
     print(f"💾 Inserted {len(data)} rows into DB")
 
@@ -87,10 +84,18 @@ def insert_db(data):
 def main():
     print("🪙 Fetching crypto market data...")
     all_data = []
+    last_dates = load_last_dates("market_data")
     for name, cid in CRYPTOS.items():
+        if not has_new_session(cid, last_dates.get(get_symbol_id(cid))):
+            print(f"⏭️ No new session for {cid}, skipping")
+            continue
         print(f"🚀 {name}")
         all_data.extend(fetch_crypto(cid))
-    save_json(all_data)
+    if not all_data:
+        print("✅ No new sessions, nothing to load.")
+        return
+
+    save_json(merge_snapshot(DATA_PATH, all_data))
     insert_db(all_data)
     print("🏁 Done.")
 
@@ -2,6 +2,7 @@
 
 from dotenv import load_dotenv
 import os
+import tempfile
 import mysql.connector
 
 # Load environment variables from local .env file
@@ -31,7 +32,9 @@ def get_connection():
             password=MYSQL_PASSWORD,
             database=MYSQL_DATABASE,
             ssl_ca=ca_path,
-            ssl_verify_cert=True
+            ssl_verify_cert=True,
+            # bulk_loader staging files only, never arbitrary client paths
+            allow_local_infile_in_path=tempfile.gettempdir()
         )
         print("✅ Connected to database.")
         return conn
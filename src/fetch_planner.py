@@ -0,0 +1,77 @@
+# src/fetch_planner.py
+# Per-run fetch planner shared by all stages (see main.py):
+#   - identical requests are fetched once per run and the result reused
+#   - concurrent callers of an in-flight request wait for the same result
+#   - each symbol declares one canonical source, the others are fallbacks
+
+import threading
+from concurrent.futures import Future
+
+# symbol -> sources in priority order (first one is canonical)
+SOURCE_PRIORITY = {
+    "GOLD": ["yfinance:GC=F", "alphavantage:XAU/USD"],
+}
+
+_lock = threading.Lock()
+_requests = {}   # request key -> Future
+_delivered = {}  # symbol -> source whose rows were kept (or found current) this run
+
+
+# ---------------- Request dedup / coalescing ----------------
+def fetch_once(key, fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) once per key and run; other callers share the result"""
+    with _lock:
+        future = _requests.get(key)
+        owner = future is None
+        if owner:
+            future = Future()
+            _requests[key] = future
+
+    if not owner:
+        return future.result()
+
+    try:
+        result = fn(*args, **kwargs)
+    except BaseException as e:
+        # Waiters see the error, later callers may retry
+        with _lock:
+            _requests.pop(key, None)
+        future.set_exception(e)
+        raise
+
+    future.set_result(result)
+    return result
+
+
+# ---------------- Canonical sources ----------------
+def should_fetch(symbol, source):
+    """True unless another source already delivered `symbol` this run.
+
+    A fallback therefore also runs when its canonical source was never
+    tried (standalone stage, or an earlier stage failed before reaching it).
+    """
+    sources = SOURCE_PRIORITY.get(symbol)
+    if not sources or source not in sources:
+        return True
+
+    with _lock:
+        return symbol not in _delivered
+
+
+def record(symbol, source, rows):
+    """Mark `source` as the delivering source for `symbol` if it returned rows"""
+    if rows:
+        mark_current(symbol, source)
+
+
+def mark_current(symbol, source):
+    """`source` already has `symbol` up to date (nothing to fetch), so fallbacks stay idle"""
+    with _lock:
+        _delivered.setdefault(symbol, source)
+
+
+def reset():
+    """Forget everything (start of a new run)"""
+    with _lock:
+        _requests.clear()
+        _delivered.clear()
@@ -9,6 +9,11 @@ from pathlib import Path
 from config.settings import API_KEYS
 from src.symbol_mapper import get_symbol_id
 from src.db_loader import get_connection
+from src.bulk_loader import upsert_rows
+from src.stream_parse import iter_object_items, take_recent
+from src.fetch_planner import fetch_once
+from src.trading_calendar import has_new_session, load_last_dates
+from src.snapshot import merge_snapshot
 
 DATA_PATH = Path(__file__).resolve().parents[1] / "data" / "forex_indexes.json"
 FOREX_SYMBOLS = ["USD/EUR", "USD/JPY", "EUR/GBP"]
@@ -20,23 +25,8 @@ def save_json(data, filepath):
         json.dump(data, f, indent=4, ensure_ascii=False)
     print(f"✅ Forex data saved to {filepath}")
 
-# ---------------- Load JSON ----------------
-def load_json(filepath):
-    if not filepath.exists():
-        print(f"❌ JSON file not found: {filepath}")
-        return None
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        print(f"📄 Loaded {len(data)} records from JSON.")
-        return data
-    except Exception as e:
-        print(f"❌ Error loading JSON: {e}")
-        return None
-
 # ---------------- Fetch Forex ----------------
-def fetch_forex(symbol):
-    from_symbol, to_symbol = symbol.split("/")
+def _fetch_fx_daily(from_symbol, to_symbol, limit, start_date):
     base_url = "https://www.alphavantage.co/query"
     params = {
         "function": "FX_DAILY",
@@ -45,33 +35,43 @@ def fetch_forex(symbol):
         "outputsize": "compact",  # last ~100 days
         "apikey": API_KEYS.get("ALPHA_VANTAGE_API_KEY")
     }
-    try:
-        r = requests.get(base_url, params=params, timeout=30)
-        data = r.json()
-    except Exception as e:
-        print(f"⚠️ AlphaVantage request failed for {symbol}: {e}")
-        return None
+    with requests.get(base_url, params=params, timeout=30, stream=True) as r:
+        r.raise_for_status()
+        ts = iter_object_items(r, "Time Series FX (Daily)")
+        return list(take_recent(ts, limit, start_date))
 
-    ts = data.get("Time Series FX (Daily)")
-    if not ts:
-        print(f"⚠️ No data returned for {symbol}")
-        return None
 
+def fetch_fx_daily(from_symbol, to_symbol, limit=90, start_date=None):
+    """[(date, values), ...] newest first; one FX_DAILY call per pair and run across all stages"""
+    key = ("alphavantage", "FX_DAILY", from_symbol, to_symbol, limit, start_date)
+    return fetch_once(key, _fetch_fx_daily, from_symbol, to_symbol, limit, start_date)
+
+
+def fetch_forex(symbol, limit=90, start_date=None):
     symbol_id = get_symbol_id(symbol)
     if not symbol_id:
         print(f"⚠️ symbol_id not found for {symbol}")
         return None
 
+    from_symbol, to_symbol = symbol.split("/")
     formatted = []
-    for date, values in list(ts.items())[:90]:
-        formatted.append({
-            "symbol_id": symbol_id,
-            "date": date,
-            "open": float(values.get("1. open", 0)),
-            "high": float(values.get("2. high", 0)),
-            "low": float(values.get("3. low", 0)),
-            "close": float(values.get("4. close", 0))
-        })
+    try:
+        for date, values in fetch_fx_daily(from_symbol, to_symbol, limit, start_date):
+            formatted.append({
+                "symbol_id": symbol_id,
+                "date": date,
+                "open": float(values.get("1. open", 0)),
+                "high": float(values.get("2. high", 0)),
+                "low": float(values.get("3. low", 0)),
+                "close": float(values.get("4. close", 0))
+            })
+    except Exception as e:
+        print(f"⚠️ AlphaVantage request failed for {symbol}: {e}")
+        return None
+
+    if not formatted:
+        print(f"⚠️ No data returned for {symbol}")
+        return None
     return formatted
 
 # ---------------- Insert to DB ----------------
@@ -81,52 +81,54 @@ def insert_forex_data(data):
         print("❌ DB connection failed.")
         return
 
-    cursor = conn.cursor()
-    query = """
-        INSERT INTO market_data (symbol_id, date, open, high, low, close)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE
-            open = VALUES(open),
-            high = VALUES(high),
-            low = VALUES(low),
-            close = VALUES(close)
-    """
+    rows = [
+        (
+            row["symbol_id"],
+            row["date"],
+            row["open"],
+            row["high"],
+            row["low"],
+            row["close"]
+        )
+        for row in data
+    ]
     try:
-        for row in data:
-            cursor.execute(query, (
-                row["symbol_id"],
-                row["date"],
-                row["open"],
-                row["high"],
-                row["low"],
-                row["close"]
-            ))
-        conn.commit()
-        print(f"✅ Inserted {len(data)} rows into 'market_data'.")
+        upsert_rows(
+            conn, "market_data",
+            ["symbol_id", "date", "open", "high", "low", "close"],
+            rows,
+            update_columns=["open", "high", "low", "close"]
+        )
+        print(f"✅ Inserted {len(rows)} rows into 'market_data'.")
     except Exception as err:
         print(f"❌ Error inserting Forex data: {err}")
     finally:
-        cursor.close()
         conn.close()
 
 # ---------------- MAIN ----------------
 def main():
     all_data = []
+    last_dates = load_last_dates("market_data")
 
     # Fetch and collect data
     for sym in FOREX_SYMBOLS:
+        if not has_new_session(sym, last_dates.get(get_symbol_id(sym))):
+            print(f"⏭️ No new session for {sym}, skipping")
+            continue
         print(f"🌍 Fetching Forex data for {sym}...")
-        res = fetch_forex(sym)
+        res = fetch_forex(sym, start_date=last_dates.get(get_symbol_id(sym)))
         if res:
             all_data.extend(res)
 
+    if not all_data:
+        print("✅ No new sessions, nothing to load.")
+        return
+
     # Save JSON
-    save_json(all_data, DATA_PATH)
+    save_json(merge_snapshot(DATA_PATH, all_data), DATA_PATH)
 
-    # Load from JSON and insert to DB
-    data_to_insert = load_json(DATA_PATH)
-    if data_to_insert:
-        insert_forex_data(data_to_insert)
+    # Insert only the rows fetched this run (the snapshot also holds skipped pairs)
+    insert_forex_data(all_data)
 
     print("✅ Forex pipeline complete.")
 
@@ -0,0 +1,396 @@
+# src/intraday.py
+# Intraday bars (1m / 5m / 1h) for the indexes, FX pairs and crypto we track
+#   intraday_bars    raw 1m/5m bars, daily partitions, dropped after RAW_RETENTION_DAYS
+#   intraday_rollups 1h/1d bars (fetched 1h + rollups of raw bars), monthly partitions
+# Bars stay in columnar batches (one array per field) until they are streamed
+# into bulk_loader's staging-table path.
+
+import os
+from datetime import date, datetime, timedelta, UTC
+from itertools import chain, repeat
+import yfinance as yf
+from src.symbol_mapper import get_symbol_id
+from src.db_loader import get_connection
+from src.bulk_loader import upsert_rows
+from src.trading_calendar import has_new_session
+
+RAW_TABLE = "intraday_bars"
+ROLLUP_TABLE = "intraday_rollups"
+RAW_RETENTION_DAYS = int(os.getenv("INTRADAY_RETENTION_DAYS", 30))
+PARTITIONS_AHEAD_DAYS = 7    # raw daily partitions created in advance
+ROLLUP_HISTORY_MONTHS = 25   # months of 1h/1d kept, older partitions dropped (yfinance 1h goes back 730d)
+
+# interval -> (yfinance period for symbols with no rows yet,
+#              yfinance lookback limit in days for start=, target table)
+INTERVALS = {
+    "1m": ("7d", 7, RAW_TABLE),
+    "5m": ("1mo", 60, RAW_TABLE),
+    "1h": ("730d", 730, ROLLUP_TABLE),
+}
+# Raw intervals in rollup priority. 5m spans the whole raw window, so each
+# finer interval only fills buckets that no earlier one has bars in: the
+# partial oldest 1m day (or missing minutes) never replaces a complete 5m bar.
+# Rollups run after the fetch and share the fetched 1h bars' timestamps,
+# so inside the raw window they overwrite them: one 1h series per symbol.
+RAW_INTERVALS = ["5m", "1m"]
+
+# Minutes past the hour at which yfinance stamps hourly bars (sessions that
+# open at :30); 1h rollup buckets start at the same minute. Others use :00.
+HOUR_OFFSET_MINUTES = {
+    "SPY": 30, "DIA": 30, "QQQ": 30,
+    "^HSI": 30, "000001.SS": 30,
+}
+
+# tracked symbol -> Yahoo ticker
+INTRADAY_SYMBOLS = {
+    "SPY": "SPY", "DIA": "DIA", "QQQ": "QQQ",
+    "^STOXX50E": "^STOXX50E", "^FTSE": "^FTSE", "^GDAXI": "^GDAXI",
+    "^N225": "^N225", "^HSI": "^HSI", "000001.SS": "000001.SS",
+    "USD/EUR": "EUR=X", "USD/JPY": "JPY=X", "EUR/GBP": "EURGBP=X",
+    "bitcoin": "BTC-USD", "ethereum": "ETH-USD", "solana": "SOL-USD", "ripple": "XRP-USD",
+}
+
+COLUMNS = ["symbol_id", "bar_interval", "ts", "open", "high", "low", "close", "volume"]
+UPDATE_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        symbol_id INT NOT NULL,
+        bar_interval VARCHAR(3) NOT NULL,
+        ts DATETIME NOT NULL,
+        open DOUBLE,
+        high DOUBLE,
+        low DOUBLE,
+        close DOUBLE,
+        volume BIGINT,
+        PRIMARY KEY (symbol_id, bar_interval, ts)
+    ) ENGINE=InnoDB
+    PARTITION BY RANGE (TO_DAYS(ts)) (
+        PARTITION pmax VALUES LESS THAN MAXVALUE
+    )
+"""
+
+# First open / last close per bucket via the ts-prefixed string trick
+ROLLUP_SQL = """
+    INSERT INTO intraday_rollups (symbol_id, bar_interval, ts, open, high, low, close, volume)
+    SELECT symbol_id, %s, bucket,
+           SUBSTRING_INDEX(MIN(CONCAT(ts, '|', open)), '|', -1) + 0,
+           MAX(high),
+           MIN(low),
+           SUBSTRING_INDEX(MAX(CONCAT(ts, '|', close)), '|', -1) + 0,
+           SUM(volume)
+    FROM (
+        SELECT symbol_id, ts, open, high, low, close, volume, {bucket} AS bucket
+        FROM intraday_bars AS r
+        WHERE bar_interval = %s AND ts >= %s AND ts < %s {gaps_only}
+    ) AS b
+    GROUP BY symbol_id, bucket
+    ON DUPLICATE KEY UPDATE
+        open = VALUES(open),
+        high = VALUES(high),
+        low = VALUES(low),
+        close = VALUES(close),
+        volume = VALUES(volume)
+"""
+# target -> (bucket start of r.ts, bucket length unit)
+ROLLUP_BUCKETS = {
+    "1h": ("DATE_ADD(DATE_FORMAT(DATE_SUB(r.ts, INTERVAL {offset} MINUTE), '%%Y-%%m-%%d %%H:00:00'), "
+           "INTERVAL {offset} MINUTE)", "HOUR"),
+    "1d": ("CAST(DATE(r.ts) AS DATETIME)", "DAY"),
+}
+# Restricts a finer interval to buckets without bars of the preferred ones
+GAPS_ONLY_SQL = """
+        AND NOT EXISTS (
+            SELECT 1 FROM intraday_bars AS c
+            WHERE c.symbol_id = r.symbol_id AND c.bar_interval IN ({preferred})
+              AND c.ts >= {bucket} AND c.ts < {bucket} + INTERVAL 1 {unit}
+        )
+"""
+
+# 1h rows off the symbol's bucket grid (e.g. a mis-stamped fetched bar) in a
+# range that was just rolled up; removing them keeps a single 1h series
+STRAY_1H_SQL = """
+    DELETE FROM intraday_rollups
+    WHERE bar_interval = '1h' AND ts >= %s AND ts < %s
+      AND MINUTE(ts) <> {offset}
+      AND symbol_id IN (
+          SELECT DISTINCT symbol_id FROM intraday_bars WHERE ts >= %s AND ts < %s
+      )
+"""
+
+
+# ---------------- Partitions ----------------
+def _to_days(d):
+    """Python date -> MySQL TO_DAYS()"""
+    return d.toordinal() + 365
+
+
+def _add_months(d, n):
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def _wanted_partitions(table, today):
+    """[(name, exclusive upper bound date), ...] ascending"""
+    if table == RAW_TABLE:
+        start = today - timedelta(days=RAW_RETENTION_DAYS)
+        days = [start + timedelta(days=i) for i in range(RAW_RETENTION_DAYS + PARTITIONS_AHEAD_DAYS + 1)]
+        return [(f"p{d:%Y%m%d}", d + timedelta(days=1)) for d in days]
+
+    first = date(today.year, today.month, 1)
+    months = [_add_months(first, i) for i in range(-ROLLUP_HISTORY_MONTHS, 3)]
+    return [(f"p{m:%Y%m}", _add_months(m, 1)) for m in months]
+
+
+def _existing_partitions(cursor, table):
+    """{name: TO_DAYS bound or None for MAXVALUE}"""
+    cursor.execute("""
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+    """, (table,))
+    return {
+        name: None if desc == "MAXVALUE" else int(desc)
+        for name, desc in cursor.fetchall()
+    }
+
+
+def ensure_partitions(cursor, table, today):
+    """Split new partitions off pmax up to a few days/months ahead"""
+    existing = _existing_partitions(cursor, table)
+    highest = max((b for b in existing.values() if b is not None), default=0)
+    new = [
+        (name, bound) for name, bound in _wanted_partitions(table, today)
+        if name not in existing and _to_days(bound) > highest
+    ]
+    if not new:
+        return
+
+    parts = ", ".join(
+        f"PARTITION {name} VALUES LESS THAN ({_to_days(bound)})" for name, bound in new
+    )
+    cursor.execute(
+        f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO "
+        f"({parts}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+    )
+    print(f"🧱 Added {len(new)} partitions to '{table}'")
+
+
+def drop_expired_partitions(cursor, table, cutoff):
+    """Drop whole partitions holding only rows before `cutoff` (O(1), no row deletes)"""
+    cutoff = _to_days(cutoff)
+    expired = [
+        name for name, bound in _existing_partitions(cursor, table).items()
+        if bound is not None and bound <= cutoff
+    ]
+    if expired:
+        cursor.execute(f"ALTER TABLE {table} DROP PARTITION {', '.join(expired)}")
+        print(f"🧹 Dropped {len(expired)} expired partitions from '{table}'")
+
+
+def ensure_schema(cursor, today):
+    for table in (RAW_TABLE, ROLLUP_TABLE):
+        cursor.execute(TABLE_SQL.format(table=table))
+        ensure_partitions(cursor, table, today)
+
+
+# ---------------- Fetch ----------------
+def load_last_ts(cursor, table, interval):
+    """Return {symbol_id: last stored bar ts} for one interval"""
+    cursor.execute(
+        f"SELECT symbol_id, MAX(ts) FROM {table} WHERE bar_interval = %s GROUP BY symbol_id",
+        (interval,)
+    )
+    return dict(cursor.fetchall())
+
+
+def fetch_intraday(symbols, interval, last_ts, period=None, start=None, not_before=None):
+    """Download {symbol: ticker} in one request (from `start`, else the full `period`)
+    and return one columnar batch per symbol"""
+    window = {"start": start} if start else {"period": period}
+    try:
+        df = yf.download(
+            list(symbols.values()), interval=interval, **window,
+            group_by="ticker", auto_adjust=False, threads=True, progress=False
+        )
+    except Exception as e:
+        print(f"⚠️ yfinance intraday request failed ({interval}): {e}")
+        return []
+
+    if df is None or df.empty:
+        print(f"⚠️ yfinance returned no {interval} bars")
+        return []
+
+    batches = []
+    for symbol, ticker in symbols.items():
+        symbol_id = get_symbol_id(symbol)
+        if not symbol_id:
+            print(f"⚠️ symbol_id not found for {symbol}")
+            continue
+
+        if df.columns.nlevels > 1:
+            if ticker not in df.columns.get_level_values(0):
+                continue
+            frame = df[ticker]
+        else:
+            frame = df
+        frame = frame.dropna(subset=["Open", "High", "Low", "Close"])
+
+        idx = frame.index
+        if idx.tz is not None:
+            idx = idx.tz_convert("UTC").tz_localize(None)
+
+        # Keep the last stored bar (it may have been partial) and everything after it
+        keep = idx >= (last_ts.get(symbol_id) or datetime.min)
+        if not_before is not None:
+            keep &= idx >= not_before
+        frame, idx = frame[keep], idx[keep]
+        if frame.empty:
+            continue
+
+        batches.append({
+            "symbol_id": symbol_id,
+            "interval": interval,
+            "ts": idx.strftime("%Y-%m-%d %H:%M:%S").tolist(),
+            "open": frame["Open"].to_numpy(dtype=float),
+            "high": frame["High"].to_numpy(dtype=float),
+            "low": frame["Low"].to_numpy(dtype=float),
+            "close": frame["Close"].to_numpy(dtype=float),
+            "volume": frame["Volume"].fillna(0).to_numpy(dtype="int64"),
+        })
+    return batches
+
+
+def batch_rows(batch):
+    """Zip a columnar batch into row tuples lazily, in COLUMNS order"""
+    return zip(
+        repeat(batch["symbol_id"]),
+        repeat(batch["interval"]),
+        batch["ts"],
+        batch["open"].tolist(),
+        batch["high"].tolist(),
+        batch["low"].tolist(),
+        batch["close"].tolist(),
+        batch["volume"].tolist(),
+    )
+
+
+# ---------------- Rollup / retention ----------------
+def _hour_offset_sql():
+    """SQL CASE giving each symbol_id its hourly bucket offset in minutes"""
+    whens = " ".join(
+        f"WHEN {sid} THEN {int(minutes)}"
+        for sid, minutes in ((get_symbol_id(s), m) for s, m in HOUR_OFFSET_MINUTES.items())
+        if sid
+    )
+    return f"(CASE symbol_id {whens} ELSE 0 END)" if whens else "0"
+
+
+def rollup(cursor, start, end):
+    """Aggregate raw bars in [start, end) into 1h and 1d rows of intraday_rollups"""
+    offset = _hour_offset_sql()
+    for i, raw_interval in enumerate(RAW_INTERVALS):
+        preferred = RAW_INTERVALS[:i]
+        for target, (bucket, unit) in ROLLUP_BUCKETS.items():
+            bucket = bucket.format(offset=offset)
+            gaps_only = GAPS_ONLY_SQL.format(
+                preferred=", ".join(["%s"] * len(preferred)), bucket=bucket, unit=unit
+            ) if preferred else ""
+            cursor.execute(
+                ROLLUP_SQL.format(bucket=bucket, gaps_only=gaps_only),
+                (target, raw_interval, start, end, *preferred)
+            )
+    cursor.execute(STRAY_1H_SQL.format(offset=offset), (start, end, start, end))
+
+
+def _rollup_start(cursor):
+    """Start of the oldest raw day not rolled up yet (per symbol), or None if there are no raw bars"""
+    cursor.execute(f"SELECT symbol_id, MIN(ts) FROM {RAW_TABLE} GROUP BY symbol_id")
+    first_raw = dict(cursor.fetchall())
+    if not first_raw:
+        return None
+
+    # 1d rows only come from rollups; their last day is re-aggregated to be safe
+    last_rolled = load_last_ts(cursor, ROLLUP_TABLE, "1d")
+    start = min(
+        max(first, last_rolled.get(sid) or first)
+        for sid, first in first_raw.items()
+    )
+    return datetime.combine(start.date(), datetime.min.time())
+
+
+def maintain(conn, today):
+    """Roll up every complete raw day not rolled up yet, then apply retention to both tables"""
+    cursor = conn.cursor()
+    try:
+        end = datetime.combine(today, datetime.min.time())
+        start = _rollup_start(cursor)
+        if start is not None and start < end:
+            rollup(cursor, start, end)
+            conn.commit()
+
+        drop_expired_partitions(cursor, RAW_TABLE, today - timedelta(days=RAW_RETENTION_DAYS))
+        drop_expired_partitions(
+            cursor, ROLLUP_TABLE,
+            _add_months(date(today.year, today.month, 1), -ROLLUP_HISTORY_MONTHS)
+        )
+    finally:
+        cursor.close()
+
+
+# ---------------- MAIN ----------------
+def main():
+    print("⏱️ Fetching intraday bars...")
+    conn = get_connection()
+    if not conn:
+        print("❌ DB connection failed.")
+        return
+
+    today = datetime.now(UTC).date()
+    raw_cutoff = datetime.combine(today - timedelta(days=RAW_RETENTION_DAYS), datetime.min.time())
+    cursor = conn.cursor()
+    try:
+        ensure_schema(cursor, today)
+
+        for interval, (period, lookback_days, table) in INTERVALS.items():
+            last_ts = load_last_ts(cursor, table, interval)
+            new_symbols, known_symbols = {}, {}
+            for symbol, ticker in INTRADAY_SYMBOLS.items():
+                last = last_ts.get(get_symbol_id(symbol))
+                if not has_new_session(symbol, last.date() if last else None):
+                    print(f"⏭️ No new session for {symbol} ({interval}), skipping")
+                    continue
+                (known_symbols if last else new_symbols)[symbol] = ticker
+
+            not_before = raw_cutoff if table == RAW_TABLE else None
+            batches = []
+            if new_symbols:
+                batches += fetch_intraday(new_symbols, interval, last_ts, period=period, not_before=not_before)
+            if known_symbols:
+                # Only from the oldest last bar among them, within yfinance's lookback
+                oldest = min(last_ts[get_symbol_id(s)] for s in known_symbols).date()
+                start = max(oldest, today - timedelta(days=lookback_days - 1))
+                batches += fetch_intraday(known_symbols, interval, last_ts, start=start.isoformat(),
+                                          not_before=not_before)
+            if not batches:
+                continue
+
+            count = upsert_rows(
+                conn, table, COLUMNS,
+                chain.from_iterable(batch_rows(b) for b in batches),
+                update_columns=UPDATE_COLUMNS
+            )
+            print(f"✅ {interval}: {count} bars into '{table}'")
+
+        maintain(conn, today)
+    except Exception as err:
+        print(f"❌ Error in intraday pipeline: {err}")
+    finally:
+        cursor.close()
+        conn.close()
+
+    print("✅ Intraday pipeline complete.")
+
+
+if __name__ == "__main__":
+    main()
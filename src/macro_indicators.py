@@ -9,6 +9,9 @@ from src.symbol_mapper import get_symbol_id
 # ❗ استاندارد پروژه – اتصال دیتابیس
 # from src.db_connection import get_connection
 from src.db_loader import get_connection  # یا هر چیزی که db.py و CI_db.py ارائه می‌دهند
+from src.bulk_loader import upsert_rows
+from src.stream_parse import iter_array_items
+from src.trading_calendar import has_new_session, load_last_dates
 
 
 FRED_API_KEY = API_KEYS.get("FRED_API_KEY")
@@ -23,43 +26,43 @@ def fetch_fred_series(series_id, lookback_days=1800):
         f"&observation_start={start_date}"
     )
 
+    # Keep only what we store: skip FRED's "." placeholders while streaming
+    observations = []
     try:
-        r = requests.get(url, timeout=30)
-        r.raise_for_status()
+        with requests.get(url, timeout=30, stream=True) as r:
+            r.raise_for_status()
+            for obs in iter_array_items(r, "observations"):
+                if obs.get("value") in ("", ".", None):
+                    continue
+                observations.append({"date": obs["date"], "value": float(obs["value"])})
     except Exception as e:
         print(f"❌ Request failed for {series_id}: {e}")
         return None
 
-    data = r.json()
-    return data.get("observations", [])
+    return observations
 
 
 def upsert_macro_data(symbol_id, series_data, source="FRED"):
-    conn = get_connection()
-    cur = conn.cursor()
-
-    sql = """
-        INSERT INTO macro_indicators (symbol_id, date, value, unit, source)
-        VALUES (%s, %s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE value=VALUES(value)
-    """
-
-    count = 0
+    rows = []
     for obs in series_data:
         if obs.get("value") in ("", ".", None):
             continue
 
-        cur.execute(sql, (
+        rows.append((
             symbol_id,
             obs["date"],
             float(obs["value"]),
             obs.get("units", None),
             source
         ))
-        count += 1
 
-    conn.commit()
-    cur.close()
+    conn = get_connection()
+    count = upsert_rows(
+        conn, "macro_indicators",
+        ["symbol_id", "date", "value", "unit", "source"],
+        rows,
+        update_columns=["value"]
+    )
     conn.close()
     return count
 
@@ -74,6 +77,7 @@ def main():
         "ECB_RATE": "ECBDFR",
         "JAPAN_RATE": "IR3TIB01JPM156N",
     }
+    last_dates = load_last_dates("macro_indicators")
 
     for symbol, fred_id in series_map.items():
         print(f"📡 Fetching {symbol} ({fred_id}) ...")
@@ -83,6 +87,10 @@ def main():
             print(f"⚠️ No symbol_id for {symbol}")
             continue
 
+        if not has_new_session(symbol, last_dates.get(symbol_id)):
+            print(f"⏭️ No new release for {symbol}, skipping")
+            continue
+
         data = fetch_fred_series(fred_id)
         if not data:
             print(f"⚠️ No data for {symbol}")
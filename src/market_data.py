@@ -10,6 +10,11 @@ from config.settings import API_KEYS
 from src.symbol_mapper import get_symbol_id
 import yfinance as yf
 from src.db_loader import get_connection  # Hybrid: Local or CI
+from src.bulk_loader import upsert_rows
+from src.stream_parse import iter_object_items, take_recent
+from src.fetch_planner import fetch_once, mark_current, record, should_fetch
+from src.trading_calendar import has_new_session, load_last_dates
+from src.snapshot import merge_snapshot
 
 DATA_PATH = Path(__file__).resolve().parents[1] / "data" / "market_indexes.json"
 
@@ -21,7 +26,12 @@ def save_json(data, filepath):
     print(f"✅ Data saved to {filepath}")
 
 # ---------------- Alpha Vantage ----------------
-def fetch_alpha_vantage_index(symbol):
+def fetch_alpha_vantage_index(symbol, limit=90, start_date=None):
+    symbol_id = get_symbol_id(symbol)
+    if not symbol_id:
+        print(f"⚠️ symbol_id not found for {symbol}")
+        return None
+
     base_url = "https://www.alphavantage.co/query"
     params = {
         "function": "TIME_SERIES_DAILY",
@@ -29,34 +39,27 @@ def fetch_alpha_vantage_index(symbol):
         "outputsize": "compact",
         "apikey": API_KEYS.get("ALPHA_VANTAGE_API_KEY")
     }
+    formatted = []
     try:
-        r = requests.get(base_url, params=params, timeout=30)
-        data = r.json()
+        with requests.get(base_url, params=params, timeout=30, stream=True) as r:
+            ts = iter_object_items(r, "Time Series (Daily)")
+            for date, values in take_recent(ts, limit, start_date):
+                formatted.append({
+                    "symbol_id": symbol_id,
+                    "date": date,
+                    "open": float(values.get("1. open", 0)),
+                    "high": float(values.get("2. high", 0)),
+                    "low": float(values.get("3. low", 0)),
+                    "close": float(values.get("4. close", 0)),
+                    "volume": int(values.get("5. volume", 0))
+                })
     except Exception as e:
         print(f"⚠️ AlphaVantage request failed for {symbol}: {e}")
         return None
 
-    if "Time Series (Daily)" not in data:
+    if not formatted:
         print(f"⚠️ AlphaVantage returned no data for {symbol}")
         return None
-
-    ts = data["Time Series (Daily)"]
-    symbol_id = get_symbol_id(symbol)
-    if not symbol_id:
-        print(f"⚠️ symbol_id not found for {symbol}")
-        return None
-
-    formatted = []
-    for date, values in list(ts.items())[:90]:
-        formatted.append({
-            "symbol_id": symbol_id,
-            "date": date,
-            "open": float(values.get("1. open", 0)),
-            "high": float(values.get("2. high", 0)),
-            "low": float(values.get("3. low", 0)),
-            "close": float(values.get("4. close", 0)),
-            "volume": int(values.get("5. volume", 0))
-        })
     return formatted
 
 # ---------------- yfinance ----------------
@@ -103,34 +106,29 @@ def insert_market_data(data):
         print("❌ DB connection failed.")
         return
 
-    cursor = conn.cursor()
-    query = """
-        INSERT INTO market_data (symbol_id, date, open, high, low, close, volume)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE
-            open = VALUES(open),
-            high = VALUES(high),
-            low = VALUES(low),
-            close = VALUES(close),
-            volume = VALUES(volume)
-    """
+    rows = [
+        (
+            row["symbol_id"],
+            row["date"],
+            row["open"],
+            row["high"],
+            row["low"],
+            row["close"],
+            row.get("volume", None)
+        )
+        for row in data
+    ]
     try:
-        for row in data:
-            cursor.execute(query, (
-                row["symbol_id"],
-                row["date"],
-                row["open"],
-                row["high"],
-                row["low"],
-                row["close"],
-                row.get("volume", None)
-            ))
-        conn.commit()
-        print(f"✅ Inserted {len(data)} rows into 'market_data'.")
+        upsert_rows(
+            conn, "market_data",
+            ["symbol_id", "date", "open", "high", "low", "close", "volume"],
+            rows,
+            update_columns=["open", "high", "low", "close", "volume"]
+        )
+        print(f"✅ Inserted {len(rows)} rows into 'market_data'.")
     except Exception as err:
         print(f"❌ Error inserting market data: {err}")
     finally:
-        cursor.close()
         conn.close()
 
 # ---------------- MAIN ----------------
@@ -138,33 +136,55 @@ def main():
     print("🚀 Fetching market index data...")
 
     all_data = []
+    last_dates = load_last_dates("market_data")
 
     # Alpha Vantage US ETFs
     us_symbols = ["SPY", "DIA", "QQQ"]
     for sym in us_symbols:
+        if not has_new_session(sym, last_dates.get(get_symbol_id(sym))):
+            print(f"⏭️ No new session for {sym}, skipping")
+            continue
         print(f"📈 Fetching Alpha Vantage data for {sym}...")
-        res = fetch_alpha_vantage_index(sym)
+        last = last_dates.get(get_symbol_id(sym))
+        res = fetch_once(("alphavantage", "TIME_SERIES_DAILY", sym, last),
+                         fetch_alpha_vantage_index, sym, start_date=last)
         if res:
             all_data.extend(res)
 
     # Global indexes via yfinance
     yahoo_symbols = ["^STOXX50E", "^FTSE", "^GDAXI", "^N225", "^HSI", "000001.SS"]
     for sym in yahoo_symbols:
+        if not has_new_session(sym, last_dates.get(get_symbol_id(sym))):
+            print(f"⏭️ No new session for {sym}, skipping")
+            continue
         print(f"🌍 Fetching yfinance data for {sym}...")
-        res = fetch_yfinance_index(sym)
+        res = fetch_once(("yfinance", sym, "3mo", "1d"), fetch_yfinance_index, sym)
         if res:
             all_data.extend(res)
 
     # GOLD Futures (GC=F) via yfinance
     gold_symbols = ["GC=F"]
     for sym in gold_symbols:
+        source = f"yfinance:{sym}"
+        if not should_fetch("GOLD", source):
+            print(f"⏭️ GOLD already loaded this run, skipping {sym}")
+            continue
+        if not has_new_session(sym, last_dates.get(get_symbol_id("GOLD"))):
+            print(f"⏭️ No new session for {sym}, skipping")
+            mark_current("GOLD", source)
+            continue
         print(f"🌟 Fetching yfinance data for {sym} (GOLD)...")
-        res = fetch_yfinance_index(sym)
+        res = fetch_once(("yfinance", sym, "3mo", "1d"), fetch_yfinance_index, sym)
+        record("GOLD", source, res)
         if res:
             all_data.extend(res)
 
+    if not all_data:
+        print("✅ No new sessions, nothing to load.")
+        return
+
     # Save JSON
-    save_json(all_data, DATA_PATH)
+    save_json(merge_snapshot(DATA_PATH, all_data), DATA_PATH)
 
     # Insert into DB
     print("💾 Inserting data into database...")
@@ -0,0 +1,37 @@
+# src/snapshot.py
+# Merge freshly fetched rows into a published data/*.json snapshot:
+# fetched rows replace the stored row of the same symbol and date, older
+# rows of a symbol are kept as its window slides forward, and every other
+# symbol keeps the rows it already had.
+
+import json
+
+
+def merge_snapshot(filepath, rows):
+    """Return the snapshot at filepath with rows merged in by (symbol_id, date)"""
+    existing = []
+    if filepath.exists():
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                existing = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Could not read {filepath.name}, starting a new snapshot: {e}")
+
+    rows = list(rows)
+    fresh = {(r["symbol_id"], r["date"]) for r in rows}
+    old = {}
+    for r in existing:
+        if (r.get("symbol_id"), r.get("date")) not in fresh:
+            old.setdefault(r.get("symbol_id"), []).append(r)
+
+    new = {}
+    for r in rows:
+        new.setdefault(r["symbol_id"], []).append(r)
+
+    # Each refreshed symbol keeps its window size (or the fetched one, if larger)
+    merged = [r for sid, rs in old.items() if sid not in new for r in rs]
+    for sid, rs in new.items():
+        kept = old.get(sid, [])
+        size = max(len(rs), sum(1 for r in existing if r.get("symbol_id") == sid))
+        merged.extend(sorted(kept + rs, key=lambda r: r["date"])[-size:])
+    return merged
@@ -0,0 +1,55 @@
+# src/stream_parse.py
+# Streaming parse of large provider payloads (Alpha Vantage, FRED)
+# With ijson installed only the slice we keep is ever decoded and the
+# download stops as soon as the caller stops iterating. Without it, the
+# body is decoded once (orjson when available) and iterated without copies.
+
+import json
+from itertools import islice
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+def _decode(response):
+    return _loads(response.content)
+
+
+def iter_object_items(response, key):
+    """Yield (name, value) pairs of the top-level object `key` of a streamed response"""
+    if ijson is not None:
+        response.raw.decode_content = True
+        yield from ijson.kvitems(response.raw, key)
+        return
+    yield from (_decode(response).get(key) or {}).items()
+
+
+def iter_array_items(response, key):
+    """Yield items of the top-level array `key` of a streamed response"""
+    if ijson is not None:
+        response.raw.decode_content = True
+        yield from ijson.items(response.raw, f"{key}.item")
+        return
+    yield from _decode(response).get(key) or []
+
+
+def take_recent(items, limit=None, start_date=None):
+    """Consume newest-first (date, values) pairs until `limit` or a date before `start_date`
+
+    `start_date` (date or ISO string) is the last stored date: it is fetched
+    again, since the stored bar may have been partial.
+    """
+    if start_date is not None:
+        start_date = str(start_date)
+    for date, values in islice(items, limit):
+        if start_date and date < start_date:
+            break
+        yield date, values
@@ -0,0 +1,250 @@
+# src/trading_calendar.py
+# Precomputed session index per exchange / 24-7 crypto / monthly releases
+#   - fetchers ask has_new_session() to skip symbols with nothing new
+#   - find_gaps() separates missing rows from market closures
+# Exchange calendars come from pandas_market_calendars (requirements.txt);
+# the built-in fixed-date + Easter rules are only a fallback when it is missing.
+
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta, UTC
+from src.db_loader import get_connection
+
+try:
+    import pandas_market_calendars as mcal
+except ImportError:
+    mcal = None
+
+WEEKDAYS = (0, 1, 2, 3, 4)
+ALL_DAYS = (0, 1, 2, 3, 4, 5, 6)
+
+# calendar -> weekdays traded, holidays ((month, day) or Easter offsets),
+# session close as an offset from the session date at 00:00 UTC
+# (the later of the summer/winter closes, so "complete" is never early)
+CALENDARS = {
+    "XNYS": {"days": WEEKDAYS, "holidays": [(1, 1), (6, 19), (7, 4), (12, 25), "good_friday"],
+             "close": timedelta(hours=21), "mcal": "XNYS"},
+    "XLON": {"days": WEEKDAYS, "holidays": [(1, 1), (12, 25), (12, 26), "good_friday", "easter_monday"],
+             "close": timedelta(hours=17), "mcal": "LSE"},
+    "XETR": {"days": WEEKDAYS, "holidays": [(1, 1), (5, 1), (12, 24), (12, 25), (12, 26), (12, 31),
+                                            "good_friday", "easter_monday"],
+             "close": timedelta(hours=17), "mcal": "XETR"},
+    "XTKS": {"days": WEEKDAYS, "holidays": [(1, 1), (1, 2), (1, 3), (2, 11), (2, 23), (4, 29), (5, 3),
+                                            (5, 4), (5, 5), (8, 11), (11, 3), (11, 23), (12, 31)],
+             "close": timedelta(hours=7), "mcal": "JPX"},
+    "XHKG": {"days": WEEKDAYS, "holidays": [(1, 1), (5, 1), (7, 1), (10, 1), (12, 25), (12, 26),
+                                            "good_friday", "easter_monday"],
+             "close": timedelta(hours=8, minutes=30), "mcal": "HKEX"},
+    "XSHG": {"days": WEEKDAYS, "holidays": [(1, 1), (5, 1), (5, 2), (5, 3), (10, 1), (10, 2), (10, 3),
+                                            (10, 4), (10, 5), (10, 6), (10, 7)],
+             "close": timedelta(hours=7), "mcal": "SSE"},
+    "CMES": {"days": WEEKDAYS, "holidays": [(1, 1), (7, 4), (12, 25), "good_friday"],
+             "close": timedelta(hours=22), "mcal": "CME_Equity"},
+    "FX": {"days": WEEKDAYS, "holidays": [(1, 1), (12, 25)],
+           "close": timedelta(hours=22)},
+    "CRYPTO": {"days": ALL_DAYS, "holidays": [],
+               "close": timedelta(hours=24)},
+    "DAILY": {"days": ALL_DAYS, "holidays": [],
+              "close": timedelta(hours=24)},
+    "MONTHLY": {"monthly": True},
+}
+
+# DB / fetch symbol -> calendar
+SYMBOL_CALENDARS = {
+    "SPY": "XNYS", "DIA": "XNYS", "QQQ": "XNYS",
+    "^STOXX50E": "XETR", "^GDAXI": "XETR", "^FTSE": "XLON",
+    "^N225": "XTKS", "^HSI": "XHKG", "000001.SS": "XSHG",
+    "GC=F": "CMES", "GOLD": "CMES",
+    "USD/EUR": "FX", "USD/JPY": "FX", "EUR/GBP": "FX", "XAU/USD": "FX",
+    "bitcoin": "CRYPTO", "ethereum": "CRYPTO", "solana": "CRYPTO", "ripple": "CRYPTO",
+    "ECB_RATE": "DAILY",
+    "BRENT": "MONTHLY", "FEDFUNDS": "MONTHLY", "CPI_US": "MONTHLY",
+    "EU_CPI": "MONTHLY", "JAPAN_RATE": "MONTHLY",
+}
+
+# Symbols stored in macro_indicators rather than market_data
+MACRO_SYMBOLS = {"FEDFUNDS", "CPI_US", "EU_CPI", "ECB_RATE", "JAPAN_RATE"}
+
+# Monthly series: days between the observation date (1st of month) and its release
+RELEASE_LAG_DAYS = {
+    "BRENT": 35,
+    "FEDFUNDS": 32,
+    "CPI_US": 45,
+    "EU_CPI": 48,
+    "JAPAN_RATE": 75,
+}
+
+# How often the ETL runs (Daily_ETL.yml): rows whose session closed after
+# the previous run may have been stored as partial bars
+RUN_INTERVAL = timedelta(days=1)
+INDEX_YEARS = 10
+
+_sessions = {}  # calendar -> sorted [date, ...]
+
+
+# ---------------- Index ----------------
+def _easter(year):
+    """Gregorian Easter Sunday (anonymous algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _holidays(spec, year):
+    out = set()
+    for h in spec:
+        if h == "good_friday":
+            out.add(_easter(year) - timedelta(days=2))
+        elif h == "easter_monday":
+            out.add(_easter(year) + timedelta(days=1))
+        else:
+            out.add(date(year, *h))
+    return out
+
+
+def _build_sessions(name, start, end):
+    cal = CALENDARS[name]
+    if cal.get("monthly"):
+        return [date(y, m, 1) for y in range(start.year, end.year + 1) for m in range(1, 13)]
+
+    if mcal is not None and cal.get("mcal"):
+        try:
+            days = mcal.get_calendar(cal["mcal"]).valid_days(start, end)
+            return [d.date() for d in days]
+        except Exception as e:
+            print(f"⚠️ pandas_market_calendars failed for {name}, using built-in rules: {e}")
+
+    holidays = set()
+    for year in range(start.year, end.year + 1):
+        holidays |= _holidays(cal["holidays"], year)
+
+    out = []
+    d = start
+    while d <= end:
+        if d.weekday() in cal["days"] and d not in holidays:
+            out.append(d)
+        d += timedelta(days=1)
+    return out
+
+
+def sessions(name):
+    """Sorted session dates for a calendar (built once, then cached)"""
+    if name not in _sessions:
+        today = datetime.now(UTC).date()
+        start = date(today.year - INDEX_YEARS, 1, 1)
+        end = date(today.year + 1, 12, 31)
+        _sessions[name] = _build_sessions(name, start, end)
+    return _sessions[name]
+
+
+def _close_time(symbol, session):
+    name = SYMBOL_CALENDARS[symbol]
+    if CALENDARS[name].get("monthly"):
+        offset = timedelta(days=RELEASE_LAG_DAYS.get(symbol, 31))
+    else:
+        offset = CALENDARS[name]["close"]
+    return datetime.combine(session, datetime.min.time(), UTC) + offset
+
+
+def _to_date(d):
+    return date.fromisoformat(d) if isinstance(d, str) else d
+
+
+# ---------------- Queries ----------------
+def latest_complete_session(symbol, now=None):
+    """Most recent session of `symbol` that has closed (or been released) by `now`"""
+    if symbol not in SYMBOL_CALENDARS:
+        return None
+    now = now or datetime.now(UTC)
+    days = sessions(SYMBOL_CALENDARS[symbol])
+    i = bisect_right(days, now.date())
+    while i > 0 and _close_time(symbol, days[i - 1]) > now:
+        i -= 1
+    return days[i - 1] if i > 0 else None
+
+
+def has_new_session(symbol, last_date, now=None):
+    """True if `symbol` may have rows newer than (or more final than) `last_date`"""
+    if symbol not in SYMBOL_CALENDARS or last_date is None:
+        return True
+    now = now or datetime.now(UTC)
+    last_date = _to_date(last_date)
+
+    latest = latest_complete_session(symbol, now)
+    if latest is None or latest > last_date:
+        return True
+    # Stored bar closed after the previous run -> it was still in progress then
+    return _close_time(symbol, last_date) > now - RUN_INTERVAL
+
+
+def expected_sessions(symbol, start, end):
+    days = sessions(SYMBOL_CALENDARS[symbol])
+    start, end = _to_date(start), _to_date(end)
+    lo = bisect_left(days, start)
+    hi = bisect_right(days, end)
+    return days[lo:hi]
+
+
+def find_gaps(symbol, dates):
+    """Sessions between the first and last stored date that have no row"""
+    if symbol not in SYMBOL_CALENDARS or not dates:
+        return []
+    stored = {_to_date(d) for d in dates}
+    return [d for d in expected_sessions(symbol, min(stored), max(stored)) if d not in stored]
+
+
+# ---------------- DB ----------------
+def load_last_dates(table="market_data"):
+    """Return {symbol_id: last stored date} for one table ({} if the DB is unreachable)"""
+    conn = get_connection()
+    if not conn:
+        return {}
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT symbol_id, MAX(date) FROM {table} GROUP BY symbol_id")
+        return {sid: _to_date(d) for sid, d in cursor.fetchall()}
+    except Exception as err:
+        print(f"⚠️ Could not load last dates from '{table}': {err}")
+        return {}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# ---------------- MAIN (gap report) ----------------
+def main():
+    from src.symbol_mapper import SYMBOL_MAP
+
+    print("🗓️ Checking stored series for gaps...")
+    conn = get_connection()
+    if not conn:
+        print("❌ DB connection failed.")
+        return
+
+    cursor = conn.cursor()
+    try:
+        for symbol, symbol_id in SYMBOL_MAP.items():
+            if symbol not in SYMBOL_CALENDARS:
+                continue
+            table = "macro_indicators" if symbol in MACRO_SYMBOLS else "market_data"
+            cursor.execute(f"SELECT date FROM {table} WHERE symbol_id = %s", (symbol_id,))
+            gaps = find_gaps(symbol, [d for (d,) in cursor.fetchall()])
+            if gaps:
+                shown = ", ".join(d.isoformat() for d in gaps[:5])
+                print(f"⚠️ {symbol}: {len(gaps)} missing sessions ({shown}{', ...' if len(gaps) > 5 else ''})")
+            else:
+                print(f"✅ {symbol}: no gaps")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()